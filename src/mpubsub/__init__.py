@@ -1,12 +1,198 @@
 """A multi-process capable publish-subscribe system."""
+import inspect
+import sys
+import types
 import warnings
 import weakref
-from typing import Dict, List, Any, Tuple
+from typing import Dict, Iterable, List, Any, Callable, Optional, Tuple
 
-from .typing import Topic, Subscriber
+from .typing import Topic, Subscriber, Message
 
 __version__ = '0.0.1'
 
+_Reaper = Callable[['_Ref'], None]
+
+# A subscriber, as stored in the topic tree (see `_Node`).
+_Entry = Tuple['_Ref', Optional[Subscriber], Optional[Tuple[str, ...]]]
+
+# Maximum number of topics to cache topic tree nodes for (see
+# `PubSub.publish()`). The cache is emptied when it gets full.
+_DISPATCH_CACHE_SIZE = 1024
+
+
+def _arg_names(subscriber: Subscriber) -> Optional[Tuple[str, ...]]:
+    """Return the names of a subscriber's message parameters.
+
+    These are the parameters after the topic, up to the first one that
+    cannot be passed positionally. Returns `None` if the subscriber's
+    signature cannot be determined.
+
+    """
+    try:
+        # Decorated subscribers are called through their wrappers, so
+        # the wrappers' own parameters are what matter.
+        params = list(inspect.signature(
+            subscriber, follow_wrapped=False).parameters.values())
+    except (TypeError, ValueError):
+        return None
+
+    names = []
+    for param in params[1:]:
+        if param.kind is not param.POSITIONAL_OR_KEYWORD:
+            break
+        names.append(param.name)
+
+    return tuple(names)
+
+
+# Message parameter names of bound methods, by function (see
+# `_method_arg_names()`).
+_method_names: 'weakref.WeakKeyDictionary[Any, Optional[Tuple[str, ...]]]'
+_method_names = weakref.WeakKeyDictionary()
+
+
+def _method_arg_names(method: types.MethodType) -> Optional[Tuple[str, ...]]:
+    """Return the names of a bound method's message parameters.
+
+    Like `_arg_names()`, but results are cached by function, since
+    they do not depend on the object the method is bound to. This
+    saves inspecting the same signature again and again when many
+    instances of a class subscribe.
+
+    """
+    func = method.__func__
+    try:
+        return _method_names[func]
+    except KeyError:
+        pass
+    except TypeError:
+        # Not weakly referenceable.
+        return _arg_names(method)
+
+    names = _method_names[func] = _arg_names(method)
+    return names
+
+
+def _unbind(subscriber: Subscriber) -> Tuple[Any, Optional[Subscriber]]:
+    """Split a subscriber into the object it is bound to and its function.
+
+    Besides bound methods, this handles other callables that expose
+    their parts the same way, through `__self__` and `__func__` (e.g.
+    methods of some extension types). Other subscribers are returned
+    as is, with a `None` function.
+
+    """
+    if isinstance(subscriber, types.MethodType):
+        return (subscriber.__self__, subscriber.__func__)
+    func = getattr(subscriber, '__func__', None)
+    if func is not None and hasattr(subscriber, '__self__'):
+        return (subscriber.__self__, func)
+    return (subscriber, None)
+
+
+def _warn_failed(sub: Any, func: Optional[Subscriber],
+                 ex: TypeError) -> None:
+    if func:
+        sub = types.MethodType(func, sub)
+    warnings.warn(f'Failed to send message to {sub}: {ex}')
+
+
+def _notify(subs: Tuple[_Entry, ...], topic: Tuple[str, ...]) -> None:
+    # Messages without arguments need no argument matching.
+    for ref, func, _names in subs:
+        sub = ref()
+        if sub is None:
+            continue
+        try:
+            if func:
+                func(sub, topic)
+            else:
+                sub(topic)
+        except TypeError as ex:
+            _warn_failed(sub, func, ex)
+
+
+def _notify_kwargs(subs: Tuple[_Entry, ...], topic: Tuple[str, ...],
+                   kwargs: Dict[str, Any]) -> None:
+    # Message arguments are passed positionally to subscribers whose
+    # parameters match them in name and order, which is cheaper than
+    # unpacking them as keyword arguments (that copies the dict on
+    # every call).
+    names = tuple(kwargs)
+    values = tuple(kwargs.values())
+
+    for ref, func, sub_names in subs:
+        sub = ref()
+        if sub is None:
+            continue
+        try:
+            if func:
+                if sub_names == names:
+                    func(sub, topic, *values)
+                else:
+                    func(sub, topic, **kwargs)
+            elif sub_names == names:
+                sub(topic, *values)
+            else:
+                sub(topic, **kwargs)
+        except TypeError as ex:
+            _warn_failed(sub, func, ex)
+
+
+# pylint: disable-next=too-few-public-methods
+class _Ref(weakref.ref):  # type: ignore[type-arg]
+    """A weak reference to a subscriber that knows its topic.
+
+    Keeping the topic on the reference itself allows a single reaper
+    callback to be shared by all subscriptions of a pub-sub, instead
+    of creating a closure for each one of them. The topic is set right
+    after the reference is created.
+
+    """
+
+    __slots__ = ('topic',)
+
+    topic: Tuple[str, ...]
+
+
+class _Node:  # pylint: disable=too-few-public-methods
+    """A node in the topic tree.
+
+    Each node holds the subscribers of the topic formed by the path
+    from the root to it, and maps topic components to child nodes.
+    Nodes also link back to their parents, so that the tree can be
+    walked up without keeping track of the path taken down.
+
+    Subscribers are stored in `subs` as `(ref, func, names)` tuples.
+    `ref` is a weak reference to the subscriber, or to the object a
+    bound method is bound to. For bound methods, `func` is the
+    underlying function, otherwise `None`. This way methods can be
+    called without going through `weakref.WeakMethod`, which is
+    implemented in Python and creates a new bound method every time it
+    is dereferenced. `names` are the names of the keyword parameters
+    the subscriber takes after the topic, in positional order, if they
+    can be passed positionally (see `_arg_names()`).
+
+    `subs` is a tuple that is replaced, never changed in place, when
+    subscribers are added or removed, so that it can be iterated
+    without copying it first.
+
+    `fanout` caches the subscribers of the node followed by those of
+    its ancestors, in the order they are notified, or is `None` if
+    that has not been computed since subscribers last changed.
+
+    """
+
+    __slots__ = ('parent', 'part', 'children', 'subs', 'fanout')
+
+    def __init__(self, parent: Optional['_Node'] = None,
+                 part: str = '') -> None:
+        self.parent = parent
+        self.part = part
+        self.children: Dict[str, '_Node'] = {}
+        self.subs: Tuple[_Entry, ...] = ()
+        self.fanout: Optional[Tuple[_Entry, ...]] = None
+
 
 class PubSub:
     """A simple publish-subscribe messaging system.
@@ -19,8 +205,14 @@ class PubSub:
 
     def __init__(self) -> None:
         """Initialize a new PubSub instance."""
-        self._subs: Dict[Tuple[str, ...],
-                         List[weakref.ReferenceType[Subscriber]]] = {}
+        self._root = _Node()
+        # Dead references are dropped as soon as their referents are
+        # gone, so that subscriber lists do not accumulate them.
+        self._reaper = self._make_reaper()
+        # Maps published topics to the deepest node along their path
+        # in the topic tree. Emptied whenever nodes are added or
+        # removed.
+        self._dispatch_cache: Dict[Tuple[str, ...], _Node] = {}
 
     def add_subscriber(self, topic: Topic, subscriber: Subscriber) -> None:
         """Add a subscriber to a topic.
@@ -37,14 +229,85 @@ class PubSub:
         elif not isinstance(topic, tuple):
             topic = (topic,)
 
-        if topic not in self._subs:
-            self._subs[topic] = []
+        (target, func) = _unbind(subscriber)
+        if func is None and hasattr(subscriber, '__self__'):
+            # Bound, but the function cannot be told apart from the
+            # object (e.g. methods of builtin types), and a weak
+            # reference to the transient bound object itself would die
+            # right away.
+            raise TypeError(f'Cannot subscribe {subscriber!r}: '
+                            'bound callables must have a __func__')
+        ref = _Ref(target, self._reaper)
+        if isinstance(subscriber, types.MethodType):
+            names = _method_arg_names(subscriber)
+        else:
+            names = _arg_names(subscriber)
+
+        node = self._root
+        for part in topic:
+            child = node.children.get(part)
+            if child is None:
+                # Interned keys make lookups with topics built from
+                # string literals, which are interned too, succeed on
+                # identity alone. Other parts only need to be hashable.
+                if type(part) is str:  # pylint: disable=unidiomatic-typecheck
+                    part = sys.intern(part)
+                child = node.children[part] = _Node(node, part)
+                self._dispatch_cache.clear()
+            node = child
+
+        ref.topic = topic
+        node.subs += ((ref, func, names),)
+        self._invalidate(node)
+
+    def _make_reaper(self) -> _Reaper:
+        # The reaper holds only a weak reference to the pub-sub, to
+        # avoid a reference cycle through the subscriber lists.
+        pubsub_ref = weakref.ref(self)
+
+        def reaper(ref: _Ref) -> None:
+            pubsub = pubsub_ref()
+            if pubsub is not None:
+                pubsub._discard(ref)  # pylint: disable=protected-access
+
+        return reaper
+
+    def _discard(self, ref: _Ref) -> None:
+        topic = ref.topic
+        node = self._root
+        for part in topic:
+            child = node.children.get(part)
+            if child is None:
+                return
+            node = child
+
+        for index, entry in enumerate(node.subs):
+            if entry[0] is ref:
+                self._remove(node, index)
+                break
+
+    def _remove(self, node: _Node, index: int) -> None:
+        node.subs = node.subs[:index] + node.subs[index + 1:]
+        self._invalidate(node)
 
-        ref = (weakref.WeakMethod(subscriber)
-               if hasattr(subscriber, '__self__')
-               else weakref.ref(subscriber))
+        # Prune nodes left without subscribers or children, so that
+        # publishing does not walk dead branches.
+        parent = node.parent
+        if parent and not (node.subs or node.children):
+            self._dispatch_cache.clear()
+            while parent and not (node.subs or node.children):
+                del parent.children[node.part]
+                node, parent = parent, parent.parent
 
-        self._subs[topic].append(ref)
+    @staticmethod
+    def _invalidate(node: _Node) -> None:
+        # Subscribers of a node are notified of messages published on
+        # topics under it, so the fanout of the whole subtree changes.
+        nodes = [node]
+        while nodes:
+            node = nodes.pop()
+            node.fanout = None
+            nodes.extend(node.children.values())
 
     def remove_subscriber(self, topic: Topic, subscriber: Subscriber) -> None:
         """Remove a subscriber from a topic.
@@ -58,19 +321,36 @@ class PubSub:
         elif not isinstance(topic, tuple):
             topic = (topic,)
 
-        try:
-            subs = self._subs[topic]
-        except KeyError:
-            return
+        node = self._root
+        for part in topic:
+            child = node.children.get(part)
+            if child is None:
+                return
+            node = child
+
+        # Bound methods are compared by their parts, like method
+        # equality does, instead of binding a new method for every
+        # stored one.
+        (target, target_func) = _unbind(subscriber)
 
-        for ref in subs:
+        for index, (ref, func, _names) in enumerate(node.subs):
+            if func is not target_func:
+                continue
             sub = ref()
-            if sub == subscriber:
-                subs.remove(ref)
+            if sub is target or (not func and sub == target):
+                self._remove(node, index)
                 break
 
     def clear_subscribers(self) -> None:
-        self._subs.clear()
+        self._root = _Node()
+        self._dispatch_cache.clear()
+
+    def _has_subscribers(self) -> bool:
+        # Whether anything is subscribed at all. Nodes are pruned as
+        # soon as they are left without subscribers or children, so
+        # only the root needs checking.
+        root = self._root
+        return bool(root.subs or root.children)
 
     def publish(self, topic: Topic, **kwargs: Any) -> None:
         """Publish a message on a topic.
@@ -84,26 +364,78 @@ class PubSub:
           kwargs: The keyword arguments to pass to the subscribers.
 
         """
-        assert isinstance(topic, (str, tuple))
-
-        if not isinstance(topic, tuple):
-            topic = (topic,)
+        # Nothing to do if there are no subscribers at all.
+        if not self._has_subscribers():
+            return
 
-        orig_topic = tuple(topic)
-        while True:
-            try:
-                subs = self._subs[topic]
-            except KeyError:
-                pass
+        # Plain tuples are by far the most common case, so check for
+        # them first with a cheap type comparison.
+        if type(topic) is not tuple:  # pylint: disable=unidiomatic-typecheck
+            if topic is None:
+                topic = ()
+            elif isinstance(topic, str):
+                topic = (topic,)
             else:
-                for ref in subs:
-                    sub = ref()
-                    if sub is None:
-                        continue
-                    try:
-                        sub(orig_topic, **kwargs)
-                    except TypeError as ex:
-                        warnings.warn(f'Failed to send message to {sub}: {ex}')
-            if not topic:
+                assert isinstance(topic, tuple)
+
+        subs = self._subscribers(topic)
+        if not subs:
+            return
+
+        if kwargs:
+            _notify_kwargs(subs, topic, kwargs)
+        else:
+            _notify(subs, topic)
+
+    def _subscribers(self, topic: Tuple[str, ...]) -> Tuple[_Entry, ...]:
+        # Return the subscribers to notify of messages on a topic.
+        cache = self._dispatch_cache
+        node = cache.get(topic)
+        if node is None:
+            node = self._match(topic)
+            if len(cache) >= _DISPATCH_CACHE_SIZE:
+                cache.clear()
+            cache[topic] = node
+
+        subs = node.fanout
+        if subs is None:
+            subs = node.fanout = self._fanout(node)
+        return subs
+
+    def publish_many(self, messages: Iterable[Message]) -> None:
+        """Publish several messages.
+
+        This is the same as calling `publish()` for each message in
+        turn, but subclasses may handle the messages as a whole. For
+        example, a NetPubSub sends them all to the broker at once.
+
+        Args:
+          messages (iterable): `(topic, kwargs)` tuples, where
+            _kwargs_ is a dictionary with the keyword arguments to pass
+            to the subscribers.
+
+        """
+        publish = self.publish
+        for (topic, kwargs) in messages:
+            publish(topic, **kwargs)
+
+    def _match(self, topic: Tuple[str, ...]) -> _Node:
+        # Find the deepest node along the topic path.
+        node = self._root
+        for part in topic:
+            child = node.children.get(part)
+            if child is None:
                 break
-            topic = topic[:-1]
+            node = child
+        return node
+
+    @staticmethod
+    def _fanout(node: _Node) -> Tuple[_Entry, ...]:
+        # Walk up the tree to the root, so that most specific topics
+        # are notified first.
+        subs: List[_Entry] = []
+        current: Optional[_Node] = node
+        while current:
+            subs.extend(current.subs)
+            current = current.parent
+        return tuple(subs)
@@ -0,0 +1,13 @@
+"""Wire format shared by pub-subs and the broker."""
+
+# Pickle protocol used for messages exchanged with the broker.
+# Protocol 4 is the highest one that all supported Python versions can
+# load, so that peers running different versions can talk to each
+# other.
+PICKLE_PROTOCOL = 4
+
+# Raw (i.e. not pickled) messages exchanged by a pub-sub and the broker
+# when connecting. Pickled data always starts with the PROTO opcode
+# (0x80), so these can not be confused with other messages.
+HELLO = b'\x01'
+HELLO_ACK = b'\x02'
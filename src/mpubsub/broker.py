@@ -1,15 +1,215 @@
 import logging
+import os
+import pickle
+import queue
+import selectors
+import struct
 import threading
 import multiprocessing as mp
 import multiprocessing.connection as mpc
-from typing import Any, Tuple, NoReturn, Set, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Any, Dict, Iterable, Tuple, NoReturn, Set, Optional,
+                    List, cast)
 
-from .typing import Message
+from ._wire import HELLO, HELLO_ACK
 
 __all__ = ['Broker']
 
 logger = logging.getLogger(__name__)
 
+# How much data to read from a client at once.
+_READ_SIZE = 65536
+
+# Whether connections can be read from and written to through their
+# file descriptors. This is not the case on Windows, where Connection
+# objects may wrap pipe handles, so messages are received and sent
+# through the Connection methods there.
+_FD_IO = hasattr(os, 'writev')
+
+
+def _iov_max() -> int:
+    try:
+        value = os.sysconf('SC_IOV_MAX')
+    except (AttributeError, ValueError, OSError):
+        value = -1
+    # Fall back to the minimum allowed by POSIX if the limit cannot be
+    # queried or is indeterminate (-1).
+    return value if value > 0 else 16
+
+
+# Maximum number of buffers to pass to os.writev().
+_IOV_MAX = _iov_max()
+
+# Message batches pending delivery, as received on the wire
+# (i.e. already framed), along with the connection they came from.
+_Pending = List[Tuple[mpc.Connection, bytes]]
+
+# Work handed over to the broker's sender thread: pending message
+# batches, the clients to forward them to, and connections to close.
+_Outgoing = Tuple[_Pending, Tuple[mpc.Connection, ...], Set[mpc.Connection]]
+
+# How many units of work can wait for the sender thread.
+_OUTBOX_SIZE = 64
+
+
+def _frame(data: bytes) -> bytes:
+    """Frame data the way `multiprocessing.connection` does."""
+    size = len(data)
+    if size > 0x7fffffff:
+        return struct.pack('!iQ', -1, size) + data
+    return struct.pack('!i', size) + data
+
+
+def _unframe(frame: bytes) -> memoryview:
+    """Return the data in a frame made by `_frame()`."""
+    view = memoryview(frame)
+    if view[:4] == struct.pack('!i', -1):
+        return view[12:]
+    return view[4:]
+
+
+def _write(fd: int, buffers: List[bytes]) -> None:
+    """Write all buffers to a file descriptor.
+
+    Buffers are written with a single `os.writev()` call, unless they
+    are too many or the write is partial.
+
+    """
+    views = [memoryview(buf) for buf in buffers]
+    start = 0
+    while start < len(views):
+        written = os.writev(fd, views[start:start + _IOV_MAX])
+        while start < len(views) and written >= len(views[start]):
+            written -= len(views[start])
+            start += 1
+        if written:
+            views[start] = views[start][written:]
+
+
+def _write_all(recipients: List[Tuple[mpc.Connection, List[bytes]]]
+               ) -> Set[mpc.Connection]:
+    """Write data to connections, and return the ones that failed."""
+    failed = set()
+    for conn, buffers in recipients:
+        try:
+            if _FD_IO:
+                _write(conn.fileno(), buffers)
+            else:
+                for frame in buffers:
+                    conn.send_bytes(_unframe(frame))
+        except (OSError, ValueError) as ex:
+            logger.debug('%s to %s: %s', ex.__class__.__name__, conn, ex)
+            failed.add(conn)
+    return failed
+
+
+class _Client:  # pylint: disable=too-few-public-methods
+    """Receiving end of a broker client connection.
+
+    Data is read from the connection's file descriptor in large
+    chunks, and whole frames are extracted from a receive buffer, so
+    that several messages can be received with a single read.
+
+    Frames use the same format as `multiprocessing.connection`.
+
+    """
+
+    __slots__ = ('conn', 'fd', 'buffer')
+
+    def __init__(self, conn: mpc.Connection):
+        self.conn = conn
+        self.fd = conn.fileno()
+        self.buffer = bytearray()
+
+    def recv(self) -> List[Tuple[Any, bytes]]:
+        """Read available data and return the objects received.
+
+        Each object is returned along with the raw frame it was
+        decoded from, header included.
+
+        Raises:
+          EOFError: If the connection was closed by the other end.
+
+        """
+        if not _FD_IO:
+            data = self.conn.recv_bytes()
+            return [(pickle.loads(data), _frame(data))]
+
+        data = os.read(self.fd, _READ_SIZE)
+        if not data:
+            raise EOFError
+
+        buf = self.buffer
+        buf += data
+
+        objs: List[Tuple[Any, bytes]] = []
+        pos = 0
+        with memoryview(buf) as view:
+            while len(buf) - pos >= 4:
+                (size,) = struct.unpack_from('!i', buf, pos)
+                start = pos + 4
+                if size == -1:
+                    # Large frame, with a 64-bit size after the marker.
+                    if len(buf) - pos < 12:
+                        break
+                    (size,) = struct.unpack_from('!Q', buf, start)
+                    start += 8
+                end = start + size
+                if len(buf) < end:
+                    break
+                objs.append((pickle.loads(view[start:end]),
+                             bytes(view[pos:end])))
+                pos = end
+
+        del buf[:pos]
+
+        return objs
+
+
+class _Receivers:
+    """The receiving ends of the broker's client connections.
+
+    Connections are registered once with a long-lived selector,
+    instead of passing the whole client set to `mpc.wait()` (which
+    builds a new selector) on every iteration. Where selectors cannot
+    wait on connections (see `_FD_IO`), `mpc.wait()` is used instead.
+
+    """
+
+    __slots__ = ('_selector', '_clients')
+
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector() if _FD_IO else None
+        self._clients: Dict[mpc.Connection, _Client] = {}
+
+    def add(self, conns: Iterable[mpc.Connection]) -> None:
+        """Start receiving from connections not seen before."""
+        for conn in conns:
+            if conn not in self._clients:
+                client = self._clients[conn] = _Client(conn)
+                if self._selector:
+                    self._selector.register(conn, selectors.EVENT_READ,
+                                            client)
+
+    def remove(self, conns: Iterable[mpc.Connection]) -> None:
+        """Stop receiving from connections."""
+        for conn in conns:
+            if self._clients.pop(conn, None) and self._selector:
+                self._selector.unregister(conn)
+
+    def wait(self) -> List[_Client]:
+        """Wait for data, and return the clients that have some."""
+        if self._selector:
+            return [key.data for key, _events in self._selector.select()]
+        return [self._clients[cast(mpc.Connection, conn)]
+                for conn in mpc.wait(list(self._clients))]
+
+    def close(self) -> None:
+        """Stop receiving from all connections."""
+        if self._selector:
+            self._selector.close()
+        self._clients.clear()
+
 
 class Broker:
     """A broker that connects publishers and subscribers.
@@ -39,18 +239,25 @@ class Broker:
       backlog: See
         https://docs.python.org/3.7/library/multiprocessing.html#multiprocessing.connection.Listener
       timeout: Client connection imeout.
+      send_threads: Maximum number of threads used to forward
+        messages to clients.
 
     """
     def __init__(self,
                  address: Any = None,
                  authkey: Optional[bytes] = None,
                  backlog: int = 1,
-                 timeout: float = 0.5):
+                 timeout: float = 0.5,
+                 send_threads: int = 4):
         self._authkey = authkey or mp.current_process().authkey
         self._listener = mpc.Listener(address,
                                       backlog=backlog, authkey=self._authkey)
         self._clients: Set[mpc.Connection] = set()
+        # A snapshot of self._clients, or None when clients are added
+        # or removed and it needs to be rebuilt.
+        self._clients_snapshot: Optional[Tuple[mpc.Connection, ...]] = None
         self._timeout = timeout
+        self._send_threads = send_threads
         self._local_connection: Optional[mpc.Connection] = None
 
     @property
@@ -80,12 +287,14 @@ class Broker:
         #
         # True (INIT) - new control connection.
         # None (NEWCONN) - new connection added.
-        # Ellipsis (NEWPUBSUB) - client init message.
+        # HELLO (NEWPUBSUB) - client init message.
         # False (STOP) - broker main thread stop / client disconnect
-        # Message (MSG) - pub-sub message
+        # List of Message (MSG) - batch of pub-sub messages
         #
         # All messages are acknowledged with the same input value,
-        # except for STOP and MSG when no ACK is sent.
+        # except for STOP and MSG when no ACK is sent, and NEWPUBSUB,
+        # acknowledged with HELLO_ACK. NEWPUBSUB messages are sent as
+        # raw bytes, all others are pickled.
         #
 
         # Get the control connection.
@@ -114,23 +323,44 @@ class Broker:
                 conn.close()
                 continue
 
-            msg = conn.recv()
-            if msg is not ...:
-                logger.error('Expecting ... from client, got %r', msg)
+            msg = conn.recv_bytes()
+            if msg != HELLO:
+                logger.error('Expecting HELLO from client, got %r', msg)
                 conn.close()
                 continue
 
-            conn.send(...)
+            conn.send_bytes(HELLO_ACK)
 
-            with clients_lock:
-                self._clients.add(conn)
+            self._add_client(clients_lock, conn)
 
             control.send(None)
             control.recv()
 
-    def _get_control_conn(self,
-                          pending: List[Tuple[mpc.Connection,
-                                              Message]]) -> mpc.Connection:
+    def _add_client(self, clients_lock: threading.Lock,
+                    conn: mpc.Connection) -> None:
+        with clients_lock:
+            self._clients.add(conn)
+            self._clients_snapshot = None
+
+    def _remove_clients(self, clients_lock: threading.Lock,
+                        conns: Set[mpc.Connection]) -> None:
+        if conns:
+            with clients_lock:
+                self._clients -= conns
+                self._clients_snapshot = None
+
+    def _get_clients(self, clients_lock: threading.Lock
+                     ) -> Tuple[mpc.Connection, ...]:
+        # The snapshot is read without locking, and only rebuilt
+        # (under the lock) after clients were added or removed, so
+        # that a stable client set is not copied on every iteration.
+        clients = self._clients_snapshot
+        if clients is None:
+            with clients_lock:
+                clients = self._clients_snapshot = tuple(self._clients)
+        return clients
+
+    def _get_control_conn(self, pending: _Pending) -> mpc.Connection:
 
         # Get the control connection set up.  Note: we do not need to
         # lock self._clients here, because at this point the main
@@ -140,28 +370,31 @@ class Broker:
 
             self._clients.add(conn)
 
-            msg = conn.recv()
+            data = conn.recv_bytes()
+            if data == HELLO:
+                # NEWPUBSUB: a NetPubSub is connecting.
+                conn.send_bytes(HELLO_ACK)
+                continue
+
+            msg = pickle.loads(data)
             if msg is True:
                 # INIT: it is the control connection.
                 conn.send(True)
                 return conn
 
-            if msg is ...:
-                # NEWPUBSUB: a NetPubSub is connecting.
-                conn.send(...)
-            elif msg is False:
+            if msg is False:
                 # STOP: a NetPubSub is disconnecting.
                 self._clients.remove(conn)
                 conn.close()
             else:
                 # An early message from a connected client.
-                pending.append((conn, msg))
+                pending.append((conn, _frame(data)))
 
     def _broker(self, clients_lock: threading.Lock) -> None:
 
-        # A deque of messages pending to be delivered. New messages
-        # are added to the right (via .append()).
-        pending: List[Tuple[mpc.Connection, Message]] = []
+        # Message batches pending to be delivered. New batches are
+        # added to the right (via .append()).
+        pending: _Pending = []
 
         # The control connection. If signals the main forwarding loop
         # to end when set to None.
@@ -172,92 +405,180 @@ class Broker:
 
         control = self._get_control_conn(pending)
 
+        receivers = _Receivers()
+        receivers.add(self._get_clients(clients_lock))
+
+        # Messages are forwarded by a separate thread, so that
+        # receiving is not stalled while messages are being sent. The
+        # outbox is bounded, so that a broker that cannot keep up
+        # eventually stops reading from clients.
+        outbox: 'queue.Queue[Optional[_Outgoing]]' = queue.Queue(
+            _OUTBOX_SIZE)
+        sender_t = threading.Thread(target=self._sender,
+                                    name='_sender_t',
+                                    args=(control, outbox))
+        sender_t.start()
+
         # Now start the main broker loop.
         while True:
-            with clients_lock:
-                if not self._clients:
-                    break
-                clients = self._clients.copy()
-
-            conns = mpc.wait(clients)
-
-            closed.clear()
-            for conn in conns:
-                assert isinstance(conn, mpc.Connection)
-                try:
-                    msg = conn.recv()
-                except EOFError:
-                    msg = None
-                except OSError as ex:
-                    logger.debug('%s from %s: %s',
-                                 conn, ex.__class__.__name__, ex)
-                    msg = None
-
-                if conn is control:
-                    control.send(msg)
-                    if msg is False:
-                        control = None  # Time to exit.
-                    else:
-                        # New connection.
-                        assert msg is None, f'Got {msg}'
-                elif msg is None or msg is False:
-                    closed.add(conn)
-                    conn.close()
+            if not self._get_clients(clients_lock):
+                break
+
+            for client in receivers.wait():
+                msgs = self._recv(client)
+                if client.conn is not control:
+                    self._queue(client.conn, msgs, pending, closed)
+                elif self._acknowledge(control, msgs):
+                    receivers.add(self._get_clients(clients_lock))
                 else:
-                    pending.append((conn, msg))
+                    control = None  # Time to exit.
+                    break
 
             if not control:
                 logger.debug('Exiting broker thread')
                 break
 
-            with clients_lock:
-                self._clients -= closed
+            receivers.remove(closed)
+            self._remove_clients(clients_lock, closed)
+
+            # Hand pending messages over to the sender thread, along
+            # with the clients to send them to. Closed connections are
+            # closed by the sender, after it is done with any messages
+            # handed over before.
+            if pending or closed:
+                outbox.put((pending, self._get_clients(clients_lock),
+                            closed))
+                pending = []
+                closed = set()
 
-            # At least the control connection should be there.
-            assert clients
+        outbox.put(None)
+        sender_t.join()
 
-            # Now forward all pending messages.
-            self._send(control, clients_lock, pending)
+        receivers.close()
 
         with clients_lock:
-            for conn in self._clients:
+            for conn in self._clients | closed:
                 conn.close()
             self._clients.clear()
+            self._clients_snapshot = None
+
+    @staticmethod
+    def _recv(client: _Client) -> List[Tuple[Any, bytes]]:
+        # Closed connections are reported as a None message.
+        try:
+            return client.recv()
+        except EOFError:
+            pass
+        except OSError as ex:
+            logger.debug('%s from %s: %s',
+                         client.conn, ex.__class__.__name__, ex)
+        return [(None, b'')]
+
+    @staticmethod
+    def _acknowledge(control: mpc.Connection,
+                     msgs: List[Tuple[Any, bytes]]) -> bool:
+        # Acknowledge control messages, and return False when it is
+        # time to stop.
+        for msg, _data in msgs:
+            control.send(msg)
+            if msg is False:
+                return False
+            # New connection.
+            assert msg is None, f'Got {msg}'
+        return True
+
+    @staticmethod
+    def _queue(conn: mpc.Connection, msgs: List[Tuple[Any, bytes]],
+               pending: _Pending, closed: Set[mpc.Connection]) -> None:
+        # Queue the message batches received from a client.
+        for msg, frame in msgs:
+            if msg is None or msg is False:
+                closed.add(conn)
+                break
+            pending.append((conn, frame))
 
-    def _send(self, control: mpc.Connection,
-              clients_lock: threading.Lock,
-              pending: List[Tuple[mpc.Connection, Message]]) -> None:
+    def _sender(self, control: mpc.Connection,
+                outbox: 'queue.Queue[Optional[_Outgoing]]') -> None:
 
-        closed: Set[mpc.Connection] = set()
+        executor = ThreadPoolExecutor(max_workers=max(self._send_threads, 1),
+                                      thread_name_prefix='_send_t')
 
-        with clients_lock:
-            clients = self._clients.copy()
+        # Connections that could not be written to. They are skipped
+        # until the broker thread notices that they are closed.
+        failed: Set[mpc.Connection] = set()
 
-        for conn, (topic, kwargs) in pending:
-            for other_conn in clients:
-                if (other_conn is conn
-                        or other_conn is control
-                        or other_conn in closed):
-                    continue
+        while True:
+            outgoing = outbox.get()
+            if outgoing is None:
+                break
 
-                try:
-                    other_conn.send((topic, kwargs))
-                except ConnectionError:
-                    other_conn.close()
-                    closed.add(other_conn)
-                except ValueError as ex:
-                    logger.critical('Could not send: %s', ex)
+            (pending, clients, closed) = outgoing
 
-        pending.clear()
+            # The broker thread blocks once the outbox is full, so
+            # this thread must keep going no matter what.
+            try:
+                if pending:
+                    failed |= self._send(
+                        control,
+                        [conn for conn in clients if conn not in failed],
+                        pending, executor)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error forwarding messages')
+
+            for conn in closed:
+                failed.discard(conn)
+                conn.close()
 
-        with clients_lock:
-            self._clients -= closed
+        executor.shutdown()
+
+    def _send(self, control: mpc.Connection,
+              clients: Iterable[mpc.Connection],
+              pending: _Pending,
+              executor: ThreadPoolExecutor) -> Set[mpc.Connection]:
+
+        # Batches are forwarded as received, without being pickled
+        # again. Each client gets all pending batches in a single
+        # scatter-gather write, except for the ones it sent itself.
+        # The same frames are shared by all recipients, and clients
+        # that sent nothing all get the same list of frames. Keys are
+        # the excluded sender, or None for all batches.
+        senders = {conn for conn, _ in pending}
+        frames: Dict[Optional[mpc.Connection], List[bytes]] = {}
+        recipients: List[Tuple[mpc.Connection, List[bytes]]] = []
+
+        for other_conn in clients:
+            if other_conn is control:
+                continue
+
+            key = other_conn if other_conn in senders else None
+            batches = frames.get(key)
+            if batches is None:
+                batches = frames[key] = [
+                    data for conn, data in pending if conn is not key]
+
+            if batches:
+                recipients.append((other_conn, batches))
+
+        # Recipients are split in shards, each written by a separate
+        # thread, so that a slow client does not hold up the others.
+        # The GIL is released while writing, so writes to different
+        # clients can proceed in parallel. Connections that failed are
+        # returned.
+        shards = min(self._send_threads, len(recipients))
+        if shards <= 1:
+            return _write_all(recipients)
+
+        failed: Set[mpc.Connection] = set()
+        for shard_failed in executor.map(
+                _write_all, [recipients[i::shards] for i in range(shards)]):
+            failed |= shard_failed
+
+        return failed
 
 
 def main() -> None:
     # pylint: disable=import-outside-toplevel
     import argparse
-    import pickle
     import secrets
     import sys
     # pylint: enable=import-outside-toplevel
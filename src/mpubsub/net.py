@@ -1,11 +1,13 @@
 """Bridge: A class for connecting a PubSub to a Broker."""
 import logging
 import multiprocessing as mp
+import pickle
 from collections import deque
 from multiprocessing.connection import Client, Connection
-from typing import Optional, Any, Deque, NoReturn
+from typing import Optional, Any, Deque, Dict, Iterable, List, NoReturn
 
 import mpubsub
+from ._wire import PICKLE_PROTOCOL, HELLO, HELLO_ACK
 from .typing import Topic, Message
 
 __all__ = ['PubSub']
@@ -15,6 +17,19 @@ LOCAL_SUFFIX = '*local'
 logger = logging.getLogger(__name__)
 
 
+def _shareable(topic: Topic) -> bool:
+    """Return whether a topic can be replaced by any topic equal to it.
+
+    This holds for tuples made only of strings, but not for other
+    parts, which may compare equal while being different (e.g. `1` and
+    `True`, or a `str` and an instance of a subclass).
+
+    """
+    # pylint: disable=unidiomatic-typecheck
+    return (type(topic) is tuple
+            and all(type(part) is str for part in topic))
+
+
 class PubSub(mpubsub.PubSub):
     """A PubSub with networking capabilities.
 
@@ -78,11 +93,11 @@ class PubSub(mpubsub.PubSub):
             raise RuntimeError('Already connected')
 
         conn = Client(self._address, authkey=self._authkey)
-        conn.send(...)
-        res = conn.recv()
-        if res is not ...:
+        conn.send_bytes(HELLO)
+        res = conn.recv_bytes()
+        if res != HELLO_ACK:
             conn.close()
-            raise RuntimeError(f'Expecting ... from client, got {res!r}')
+            raise RuntimeError(f'Expecting HELLO_ACK from broker, got {res!r}')
         self._conn = conn
         logger.debug('Connected to broker at %r', self._address)
 
@@ -113,18 +128,45 @@ class PubSub(mpubsub.PubSub):
         published locally.
 
         """
+        if self._enqueue(topic, kwargs) and not self._flushing:
+            self._flush()
+
+    def publish_many(self, messages: Iterable[Message]) -> None:
+        """Publish several messages to this pub-sub and remote brokers.
+
+        Messages are sent to the broker in a single batch.
+
+        Args:
+          messages (iterable): `(topic, kwargs)` tuples, where
+            _kwargs_ is a dictionary with the keyword arguments to pass
+            to the subscribers.
+
+        """
+        queued = False
+        for (topic, kwargs) in messages:
+            if self._enqueue(topic, kwargs):
+                queued = True
+        if queued and not self._flushing:
+            self._flush()
+
+    def _enqueue(self, topic: Topic, kwargs: Dict[str, Any]) -> bool:
+        # Queue a message for sending, and return whether it was
+        # queued. Local messages are published right away instead.
+
+        local = self._has_subscribers()
+
         if not self._conn or (topic
                               and isinstance(topic, tuple)
                               and topic[-1] == LOCAL_SUFFIX):
             # Not connected or local message.
-            super().publish(topic, **kwargs)
-            return
+            if local:
+                super().publish(topic, **kwargs)
+            return False
 
-        self._pending_publish.append((topic, kwargs))
+        if local:
+            self._pending_publish.append((topic, kwargs))
         self._pending_send.append((topic, kwargs))
-
-        if not self._flushing:
-            self._flush()
+        return True
 
     def wait_forever(self) -> NoReturn:
         """Wait indefinitely for messages to be published.
@@ -182,36 +224,78 @@ class PubSub(mpubsub.PubSub):
     def _recv_all(self) -> None:
         assert self._conn
         while self._conn.poll():
-            self._pending_publish.append(self._conn.recv())
+            # Messages arrive in batches; see _flush().
+            self._pending_publish.extend(self._conn.recv())
 
     def _flush(self) -> None:
         assert self._conn
 
         assert not self._flushing, 'Already flushing'
 
+        # Subscribers called below may publish, which only queues
+        # messages while flushing; they are picked up by the next
+        # iteration, so each iteration sends everything queued by the
+        # previous one in a single batch.
         self._flushing = True
+        pending_publish = self._pending_publish
+        publish = super().publish
+        try:
+            while self._conn and (pending_publish or self._pending_send):
+                self._recv_all()
+                if self._pending_send:
+                    self._send_pending()
+                while pending_publish:
+                    (topic, kwargs) = pending_publish.popleft()
+                    publish(topic, **kwargs)
+        finally:
+            self._flushing = False
+
+    def _send_pending(self) -> None:
+        assert self._conn
 
-        while (self._pending_publish or self._pending_send) and self._conn:
-            self._recv_all()
-
+        # Batches are pickled here rather than by Connection.send(),
+        # which sets up a new ForkingPickler for every call.
+        if len(self._pending_send) > 1:
+            # Make messages on the same topic share the topic object,
+            # so that pickle writes it only once per batch, and
+            # receivers get a single tuple instead of one per message.
+            topics: Dict[Topic, Topic] = {}
+            batch = [(topics.setdefault(topic, topic)
+                      if _shareable(topic) else topic, kwargs)
+                     for (topic, kwargs) in self._pending_send]
+        else:
+            batch = list(self._pending_send)
+
+        try:
+            data = pickle.dumps(batch, protocol=PICKLE_PROTOCOL)
+        except Exception:  # pylint: disable=broad-except
+            self._send_picklable(batch)
+            raise
+        self._pending_send.clear()
+        self._send_bytes(data)
+
+    def _send_picklable(self, batch: List[Message]) -> None:
+        # Send the messages of a batch that pickle can handle, and
+        # drop the others, so that a bad message does not take the
+        # whole batch down with it.
+        picklable = []
+        for msg in batch:
             try:
-                msg = self._pending_send.popleft()
-                self._conn.send(msg)
-            except IndexError:
-                pass
-            except ValueError as ex:
-                logger.error('Could not send: %s', ex)
-            except ConnectionResetError:
-                self._pending_send.clear()
-                self._conn.close()
-                self._conn = None
-                break
-
-            while True:
-                try:
-                    (topic, kwargs) = self._pending_publish.popleft()
-                except IndexError:
-                    break
-                super().publish(topic, **kwargs)
+                pickle.dumps(msg, protocol=PICKLE_PROTOCOL)
+            except Exception:  # pylint: disable=broad-except
+                continue
+            picklable.append(msg)
+        self._pending_send.clear()
+        if picklable:
+            self._send_bytes(pickle.dumps(picklable,
+                                          protocol=PICKLE_PROTOCOL))
 
-        self._flushing = False
+    def _send_bytes(self, data: bytes) -> None:
+        assert self._conn
+        try:
+            self._conn.send_bytes(data)
+        except ValueError as ex:
+            logger.error('Could not send: %s', ex)
+        except ConnectionResetError:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,157 @@
+# pylint: disable=protected-access
+import os
+import pickle
+import struct
+import unittest
+import multiprocessing.connection as mpc
+from typing import List
+from unittest import mock
+
+from mpubsub import broker
+
+
+class ClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        (self.conn, self.other) = mpc.Pipe()
+        self.client = broker._Client(self.conn)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.other.close()
+
+    def _write(self, data: bytes) -> None:
+        os.write(self.other.fileno(), data)
+
+    def test_frame(self) -> None:
+        # Frames must be readable by multiprocessing connections.
+        data = pickle.dumps(['a'])
+        self._write(broker._frame(data))
+        self.assertEqual(self.conn.recv_bytes(), data)
+
+    def test_several_frames(self) -> None:
+        self.other.send(['a'])
+        self.other.send(['b'])
+        self.assertEqual([obj for obj, _frame in self.client.recv()],
+                         [['a'], ['b']])
+
+    def test_raw_frames(self) -> None:
+        data = pickle.dumps(['a'])
+        self.other.send_bytes(data)
+        self.assertEqual(self.client.recv(),
+                         [(['a'], broker._frame(data))])
+
+    def test_split_frame(self) -> None:
+        frame = broker._frame(pickle.dumps(['a']))
+        self._write(frame[:2])
+        self.assertEqual(self.client.recv(), [])
+        self._write(frame[2:-1])
+        self.assertEqual(self.client.recv(), [])
+        self._write(frame[-1:] + frame)
+        self.assertEqual(self.client.recv(),
+                         [(['a'], frame), (['a'], frame)])
+
+    def test_large_frame_header(self) -> None:
+        data = pickle.dumps(['a'])
+        frame = struct.pack('!iQ', -1, len(data)) + data
+        self._write(frame[:8])
+        self.assertEqual(self.client.recv(), [])
+        self._write(frame[8:])
+        self.assertEqual(self.client.recv(), [(['a'], frame)])
+
+    def test_eof(self) -> None:
+        self.other.close()
+        with self.assertRaises(EOFError):
+            self.client.recv()
+
+
+class WriteAllTest(unittest.TestCase):
+    def test_failed_connections(self) -> None:
+        (closed, closed_other) = mpc.Pipe()
+        (conn, other) = mpc.Pipe()
+        closed.close()
+        frame = broker._frame(b'hello')
+        try:
+            failed = broker._write_all([(closed, [frame]), (conn, [frame])])
+            self.assertEqual(failed, {closed})
+            self.assertEqual(other.recv_bytes(), b'hello')
+        finally:
+            closed_other.close()
+            conn.close()
+            other.close()
+
+
+class WriteTest(unittest.TestCase):
+    def setUp(self) -> None:
+        (self.read_fd, self.write_fd) = os.pipe()
+
+    def tearDown(self) -> None:
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def _read(self, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            data += os.read(self.read_fd, size - len(data))
+        return data
+
+    def test_write(self) -> None:
+        buffers = [b'abc', b'', b'defgh']
+        broker._write(self.write_fd, buffers)
+        self.assertEqual(self._read(8), b'abcdefgh')
+
+    def test_partial_writes(self) -> None:
+        writes: List[int] = []
+
+        def writev(fd: int, buffers: List[bytes]) -> int:
+            # Write 3 bytes at most.
+            written = os.write(fd, b''.join(buffers)[:3])
+            writes.append(written)
+            return written
+
+        buffers = [b'abcd', b'e', b'fghijklm']
+        with mock.patch('os.writev', writev), \
+             mock.patch.object(broker, '_IOV_MAX', 2):
+            broker._write(self.write_fd, buffers)
+        self.assertEqual(self._read(13), b'abcdefghijklm')
+        self.assertEqual(writes, [3, 2, 3, 3, 2])
+
+    def test_iov_max(self) -> None:
+        with mock.patch('os.sysconf', return_value=-1):
+            self.assertEqual(broker._iov_max(), 16)
+        with mock.patch('os.sysconf', return_value=1024):
+            self.assertEqual(broker._iov_max(), 1024)
+
+
+class ConnectionIOTest(unittest.TestCase):
+    # Connection based I/O, used where file descriptors cannot be
+    # used directly.
+
+    def setUp(self) -> None:
+        (self.conn, self.other) = mpc.Pipe()
+        patcher = mock.patch.object(broker, '_FD_IO', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.other.close()
+
+    def test_recv(self) -> None:
+        data = pickle.dumps(['a'])
+        self.other.send_bytes(data)
+        client = broker._Client(self.conn)
+        self.assertEqual(client.recv(), [(['a'], broker._frame(data))])
+
+    def test_write_all(self) -> None:
+        frames = [broker._frame(b'hello'), broker._frame(b'world')]
+        self.assertEqual(broker._write_all([(self.conn, frames)]), set())
+        self.assertEqual(self.other.recv_bytes(), b'hello')
+        self.assertEqual(self.other.recv_bytes(), b'world')
+
+    def test_receivers(self) -> None:
+        receivers = broker._Receivers()
+        receivers.add([self.conn])
+        self.other.send(['a'])
+        (client,) = receivers.wait()
+        self.assertEqual([obj for obj, _frame in client.recv()], [['a']])
+        receivers.close()
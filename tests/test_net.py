@@ -0,0 +1,215 @@
+# pylint: disable=protected-access
+import os
+import signal
+import time
+import unittest
+import multiprocessing as mp
+import multiprocessing.connection as mpc
+from typing import Any, Callable, List, Tuple
+
+from mpubsub import net
+from mpubsub.broker import Broker
+from mpubsub.typing import Topic
+
+
+class _Part(str):
+    pass
+
+
+class SendTest(unittest.TestCase):
+    def setUp(self) -> None:
+        (self.conn, self.other) = mpc.Pipe()
+        self.pubsub = net.PubSub(None)
+        self.pubsub._conn = self.conn
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.other.close()
+
+    def test_unpicklable_message(self) -> None:
+        # Only messages that cannot be pickled are dropped from a batch.
+        def publisher(_topic: Topic) -> None:
+            self.pubsub.publish_many([
+                ('b', {'msg': 2}),
+                ('b', {'msg': lambda: None}),
+                ('b', {'msg': 3}),
+            ])
+
+        def subscriber(_topic: Topic, _msg: Any) -> None:
+            pass
+
+        self.pubsub.add_subscriber('a', publisher)
+        self.pubsub.add_subscriber('b', subscriber)
+
+        with self.assertRaises(Exception):
+            self.pubsub.publish('a')
+
+        self.assertEqual(self.other.recv(), [('a', {})])
+        self.assertEqual(self.other.recv(),
+                         [('b', {'msg': 2}), ('b', {'msg': 3})])
+        self.assertFalse(self.other.poll())
+        self.assertFalse(self.pubsub._pending_send)
+
+    def test_topics_shared(self) -> None:
+        # Only topics made of plain strings are shared within a batch,
+        # since other parts may compare equal while being different.
+        topics: List[Any] = [('s', 'x'), ('s', 'x'),
+                             ('s', 1), ('s', True),
+                             ('s', _Part('x')), ('s', 'x')]
+        # Equal topics are distinct objects until shared.
+        self.pubsub.publish_many((tuple(list(topic)), {}) for topic in topics)
+
+        received = [topic for topic, _kwargs in self.other.recv()]
+        self.assertEqual(received, topics)
+        self.assertEqual([type(topic[1]) for topic in received],
+                         [type(topic[1]) for topic in topics])
+        self.assertIs(received[0], received[1])
+        self.assertIs(received[0], received[5])
+        self.assertIsNot(received[2], received[3])
+
+
+def _run_broker(conn: mpc.Connection) -> None:
+    broker = Broker()
+    conn.send(broker.address)
+    conn.close()
+    try:
+        broker.start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker._listener.close()
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires fork()')
+class BrokerTest(unittest.TestCase):
+    # Messages exchanged between pub-subs through a broker running in
+    # another process.
+
+    def setUp(self) -> None:
+        (reader, writer) = mp.Pipe(duplex=False)
+        self.process = mp.get_context('fork').Process(target=_run_broker,
+                                                      args=(writer,))
+        self.process.start()
+        self.addCleanup(self._stop_broker)
+        writer.close()
+        self.address = reader.recv()
+        reader.close()
+
+        self.a = self._connect()
+        self.b = self._connect()
+
+        self.received_a: List[Tuple[Topic, Any]] = []
+        self.received_b: List[Tuple[Topic, Any]] = []
+        self.a.add_subscriber('a', self._subscriber_a)
+        self.b.add_subscriber('a', self._subscriber_b)
+
+        self.synced = 0
+        self._sync(self.a, self.b)
+
+    def _stop_broker(self) -> None:
+        # The broker only stops cleanly when interrupted while waiting
+        # for connections, which its main thread goes back to shortly
+        # after a client is added.
+        time.sleep(0.1)
+        assert self.process.pid
+        os.kill(self.process.pid, signal.SIGINT)
+        self.process.join(5)
+        if self.process.exitcode is None:
+            self.process.kill()
+            self.process.join()
+        self.assertEqual(self.process.exitcode, 0)
+
+    def _connect(self) -> net.PubSub:
+        pubsub = net.PubSub(self.address)
+        pubsub.connect()
+        self.addCleanup(self._disconnect, pubsub)
+        return pubsub
+
+    @staticmethod
+    def _disconnect(pubsub: net.PubSub) -> None:
+        if pubsub._conn:
+            pubsub.disconnect()
+
+    def _subscriber_a(self, topic: Topic, msg: Any = None) -> None:
+        self.received_a.append((topic, msg))
+
+    def _subscriber_b(self, topic: Topic, msg: Any = None) -> None:
+        self.received_b.append((topic, msg))
+
+    def _sync_subscriber(self, _topic: Topic) -> None:
+        self.synced += 1
+
+    def _poll_until(self, pubsub: net.PubSub,
+                    condition: Callable[[], bool]) -> None:
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'Timed out')
+            pubsub.poll(0.1)
+
+    def _sync(self, one: net.PubSub, other: net.PubSub) -> None:
+        # Exchange messages between two pub-subs. Clients are added
+        # to the broker only after their connection is acknowledged,
+        # so messages sent right after connecting may not be forwarded
+        # to all of them, and are sent again until they are.
+        for (sender, receiver) in ((one, other), (other, one)):
+            self.synced = 0
+            receiver.add_subscriber('sync', self._sync_subscriber)
+            deadline = time.monotonic() + 5
+            while not self.synced:
+                self.assertLess(time.monotonic(), deadline, 'Timed out')
+                sender.publish('sync')
+                receiver.poll(0.1)
+            receiver.remove_subscriber('sync', self._sync_subscriber)
+
+    def test_publish(self) -> None:
+        sent: List[Tuple[Topic, Any]] = []
+        for i in range(100):
+            self.a.publish(('a', 'b'), msg=i)
+            sent.append((('a', 'b'), i))
+        self.a.publish_many(('a', {'msg': i}) for i in range(100, 200))
+        sent += [(('a',), i) for i in range(100, 200)]
+        self.a.publish('a', msg=b'x' * 1000000)
+        sent.append((('a',), b'x' * 1000000))
+
+        self._poll_until(self.b, lambda: len(self.received_b) == len(sent))
+        self.assertEqual(self.received_b, sent)
+
+        # Messages are published locally once, and not forwarded back
+        # by the broker, which would have done that before forwarding
+        # the messages below.
+        self._sync(self.b, self.a)
+        self.assertEqual(self.received_a, sent)
+
+    def test_local(self) -> None:
+        self.a.publish(('a', net.LOCAL_SUFFIX), msg=1)
+        self.a.publish('a', msg=2)
+        self._poll_until(self.b, lambda: bool(self.received_b))
+        self.assertEqual(self.received_b, [(('a',), 2)])
+        self.assertEqual(self.received_a,
+                         [(('a', net.LOCAL_SUFFIX), 1), (('a',), 2)])
+
+    def test_disconnect(self) -> None:
+        self.b.disconnect()
+        with self.assertRaises(RuntimeError):
+            self.b.poll()
+
+        # Without a connection, messages are only published locally.
+        self.b.publish('a', msg=1)
+        self.assertEqual(self.received_b, [(('a',), 1)])
+
+        # The broker drops the connection, and keeps forwarding
+        # messages. The message published while disconnected may or
+        # may not reach the new connection, depending on whether the
+        # broker gets it before the connection is added.
+        self.a.publish('a', msg=2)
+        self.b.connect()
+        self._sync(self.a, self.b)
+        self.a.publish('a', msg=3)
+        self._poll_until(self.b, lambda: (('a',), 3) in self.received_b)
+        self.assertIn(self.received_b, ([(('a',), 1), (('a',), 3)],
+                                        [(('a',), 1), (('a',), 2),
+                                         (('a',), 3)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
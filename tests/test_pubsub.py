@@ -1,10 +1,13 @@
+# pylint: disable=too-few-public-methods
+import functools
 import unittest
-from typing import List, Tuple
+from typing import Any, List, Tuple
 
 from mpubsub import PubSub
-from mpubsub.typing import Topic
+from mpubsub.typing import Topic, Subscriber
 
 
+# pylint: disable-next=too-many-public-methods
 class TestPubSub(unittest.TestCase):
     def setUp(self) -> None:
         self.pubsub = PubSub()
@@ -36,6 +39,23 @@ class TestPubSub(unittest.TestCase):
         # Check that the subscriber did not receive the message
         self.assertEqual(self.messages, [])
 
+    def test_remove_subscriber_other_instance(self) -> None:
+        class TestObject:
+            def __init__(self) -> None:
+                self.messages: List[str] = []
+
+            def callback(self, _topic: Topic, message: str) -> None:
+                self.messages.append(message)
+
+        (obj, other) = (TestObject(), TestObject())
+        self.pubsub.add_subscriber('foo', obj.callback)
+        self.pubsub.add_subscriber('foo', other.callback)
+        self.pubsub.remove_subscriber('foo', obj.callback)
+        self.pubsub.publish('foo', message='hello')
+
+        self.assertEqual(obj.messages, [])
+        self.assertEqual(other.messages, ['hello'])
+
     def test_remove_subscriber_func(self) -> None:
         calls = 0
 
@@ -101,3 +121,178 @@ class TestPubSub(unittest.TestCase):
         with self.assertWarns(Warning):
             self.pubsub.publish('foo', unkown_kwarg=123)
         self.assertEqual(self.messages, [])
+
+    def test_publish_order(self) -> None:
+        # Most specific subscribers are notified first
+        def subscriber(name: str) -> Subscriber:
+            def callback(_topic: Topic, message: str) -> None:
+                self.messages.append(((name,), message))
+            return callback
+
+        subscribers = [subscriber(name) for name in ('all', 'a', 'abc')]
+        self.pubsub.add_subscriber(None, subscribers[0])
+        self.pubsub.add_subscriber('a', subscribers[1])
+        self.pubsub.add_subscriber(('a', 'b', 'c'), subscribers[2])
+
+        self.pubsub.publish(('a', 'b', 'c', 'd'), message='hello')
+        self.pubsub.publish(('a', 'x'), message='world')
+
+        self.assertEqual(self.messages, [
+            (('abc',), 'hello'),
+            (('a',), 'hello'),
+            (('all',), 'hello'),
+            (('a',), 'world'),
+            (('all',), 'world'),
+        ])
+
+    def test_remove_subscriber_keeps_parent(self) -> None:
+        self.pubsub.add_subscriber('a', self._subscriber)
+        self.pubsub.add_subscriber(('a', 'b', 'c'), self._subscriber)
+        self.pubsub.remove_subscriber(('a', 'b', 'c'), self._subscriber)
+        self.pubsub.remove_subscriber(('a', 'x'), self._subscriber)
+
+        self.pubsub.publish(('a', 'b', 'c'), message='hello')
+        self.assertEqual(self.messages, [(('a', 'b', 'c'), 'hello')])
+
+    def test_remove_subscriber_while_publishing(self) -> None:
+        def subscriber(topic: Topic, message: str) -> None:
+            self.pubsub.remove_subscriber('foo', subscriber)
+            self.messages.append((topic, message))
+
+        self.pubsub.add_subscriber('foo', subscriber)
+        self.pubsub.add_subscriber('foo', self._subscriber)
+        self.pubsub.publish('foo', message='hello')
+        self.pubsub.publish('foo', message='world')
+
+        self.assertEqual(self.messages, [
+            (('foo',), 'hello'),
+            (('foo',), 'hello'),
+            (('foo',), 'world'),
+        ])
+
+    def test_publish_kwargs_order(self) -> None:
+        received = []
+
+        def subscriber(_topic: Topic, first: int, second: int = 0) -> None:
+            received.append((first, second))
+
+        self.pubsub.add_subscriber('foo', subscriber)
+        self.pubsub.publish('foo', first=1, second=2)
+        self.pubsub.publish('foo', second=2, first=1)
+        self.pubsub.publish('foo', first=1)
+        self.assertEqual(received, [(1, 2), (1, 2), (1, 0)])
+
+    def test_publish_none(self) -> None:
+        self.pubsub.add_subscriber(None, self._subscriber)
+        self.pubsub.publish(None, message='hello')
+        self.assertEqual(self.messages, [((), 'hello')])
+
+    def test_publish_topic_not_copied(self) -> None:
+        topic = ('a', 'b')
+        self.pubsub.add_subscriber('a', self._subscriber)
+        self.pubsub.add_subscriber(topic, self._subscriber)
+        self.pubsub.publish(topic, message='hello')
+        self.assertEqual(len(self.messages), 2)
+        for received, _message in self.messages:
+            self.assertIs(received, topic)
+
+    def test_subscribe_after_publish(self) -> None:
+        # Subscribers added after a topic was published get later
+        # messages, regardless of where in the tree they are added.
+        self.pubsub.add_subscriber(('a', 'b'), self._subscriber)
+        self.pubsub.publish(('a', 'b'), message='hello')
+        self.pubsub.add_subscriber('a', self._subscriber)
+        self.pubsub.publish(('a', 'b'), message='world')
+        self.pubsub.remove_subscriber(('a', 'b'), self._subscriber)
+        self.pubsub.publish(('a', 'b'), message='bye')
+
+        self.assertEqual(self.messages, [
+            (('a', 'b'), 'hello'),
+            (('a', 'b'), 'world'),
+            (('a', 'b'), 'world'),
+            (('a', 'b'), 'bye'),
+        ])
+
+    def test_publish_without_kwargs(self) -> None:
+        topics: List[Topic] = []
+
+        def subscriber(topic: Topic) -> None:
+            topics.append(topic)
+
+        self.pubsub.add_subscriber('foo', subscriber)
+        self.pubsub.add_subscriber('foo', self._subscriber)
+        with self.assertWarns(Warning):
+            self.pubsub.publish('foo')
+        self.assertEqual(topics, [('foo',)])
+        self.assertEqual(self.messages, [])
+
+    def test_publish_many(self) -> None:
+        self.pubsub.add_subscriber('foo', self._subscriber)
+        self.pubsub.publish_many([
+            ('foo', {'message': 'hello'}),
+            (('foo', 'bar'), {'message': 'world'}),
+            ('bar', {'message': 'bye'}),
+        ])
+        self.assertEqual(self.messages, [
+            (('foo',), 'hello'),
+            (('foo', 'bar'), 'world'),
+        ])
+
+    def test_subscribe_below_published_topic(self) -> None:
+        self.pubsub.add_subscriber('a', self._subscriber)
+        self.pubsub.add_subscriber(('x', 'y'), self._subscriber)
+        self.pubsub.publish(('a', 'b', 'c'), message='hello')
+        self.pubsub.publish(('x', 'y'), message='hello')
+        self.pubsub.add_subscriber(('a', 'b'), self._subscriber)
+        self.pubsub.publish(('a', 'b', 'c'), message='world')
+        self.pubsub.publish(('x', 'y'), message='world')
+
+        self.assertEqual(self.messages, [
+            (('a', 'b', 'c'), 'hello'),
+            (('x', 'y'), 'hello'),
+            (('a', 'b', 'c'), 'world'),
+            (('a', 'b', 'c'), 'world'),
+            (('x', 'y'), 'world'),
+        ])
+
+    def test_subscribe_while_publishing(self) -> None:
+        # Subscribers added while publishing, including by re-entrant
+        # publishes, only get messages published after that.
+        def subscriber(topic: Topic, message: str) -> None:
+            self.messages.append((topic, message))
+            if message == 'hello':
+                self.pubsub.add_subscriber('foo', self._subscriber)
+                self.pubsub.publish('foo', message='nested')
+
+        self.pubsub.add_subscriber('foo', subscriber)
+        self.pubsub.publish('foo', message='hello')
+
+        self.assertEqual(self.messages, [
+            (('foo',), 'hello'),
+            (('foo',), 'nested'),
+            (('foo',), 'nested'),
+        ])
+
+    def test_publish_to_wrapped_subscriber(self) -> None:
+        def decorator(func: Subscriber) -> Subscriber:
+            @functools.wraps(func)
+            def wrapper(topic: Topic, **kwargs: Any) -> None:
+                func(topic, **kwargs)
+            return wrapper
+
+        subscriber = decorator(self._subscriber)
+        self.pubsub.add_subscriber('foo', subscriber)
+        self.pubsub.publish('foo', message='hello')
+        self.assertEqual(self.messages, [(('foo',), 'hello')])
+
+    def test_non_str_topic_parts(self) -> None:
+        class Part(str):
+            pass
+
+        # Not a Topic as typed, but hashable parts used to work.
+        topic: Any = ('sensor', 1, Part('x'))
+        self.pubsub.add_subscriber(topic, self._subscriber)
+        self.pubsub.publish(topic, message='hello')
+        self.pubsub.remove_subscriber(topic, self._subscriber)
+        self.pubsub.publish(topic, message='world')
+        self.assertEqual(self.messages, [(topic, 'hello')])
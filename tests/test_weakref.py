@@ -1,9 +1,11 @@
 # pylint: disable=too-few-public-methods
+import collections
 import gc
 import unittest
+from typing import Any
 
 from mpubsub import PubSub
-from mpubsub.typing import Topic
+from mpubsub.typing import Topic, Subscriber
 
 
 class PubSubTest(unittest.TestCase):
@@ -44,3 +46,91 @@ class PubSubTest(unittest.TestCase):
         gc.collect()
         self.pubsub.publish(('a',))
         self.assertEqual(calls, 1)
+
+    def test_weakref_pruned(self) -> None:
+        class TestObject:
+            def callback(self, _topic: Topic) -> None:
+                pass
+
+        obj = TestObject()
+        self.pubsub.add_subscriber(('a', 'b'), obj.callback)
+
+        del obj
+        gc.collect()
+        # pylint: disable-next=protected-access
+        self.assertEqual(self.pubsub._root.children, {})
+
+    def test_weakref_dies_while_publishing(self) -> None:
+        calls = []
+
+        class TestObject:
+            def callback(self, _topic: Topic) -> None:
+                calls.append(self)
+
+        objs = [TestObject()]
+
+        def killer(_topic: Topic) -> None:
+            objs.clear()
+
+        self.pubsub.add_subscriber(('a', 'b'), killer)
+        self.pubsub.add_subscriber(('a',), objs[0].callback)
+        self.pubsub.publish(('a', 'b'))
+        self.assertEqual(calls, [])
+
+    def test_weakref_pruned_without_gc(self) -> None:
+        # Subscribers not involved in reference cycles are dropped as
+        # soon as they are freed, without a garbage collection.
+        class TestObject:
+            def callback(self, _topic: Topic) -> None:
+                pass
+
+        obj = TestObject()
+        self.pubsub.add_subscriber(('a', 'b'), obj.callback)
+        self.pubsub.publish(('a', 'b'))
+
+        gc.disable()
+        try:
+            del obj
+            # pylint: disable-next=protected-access
+            self.assertEqual(self.pubsub._root.children, {})
+            # pylint: disable-next=protected-access
+            self.assertEqual(self.pubsub._dispatch_cache, {})
+        finally:
+            gc.enable()
+
+    def test_builtin_bound_method(self) -> None:
+        # Subscribers bound to an object that cannot be split from
+        # their function are refused, instead of silently dropped.
+        queue: 'collections.deque[Topic]' = collections.deque()
+        with self.assertRaises(TypeError):
+            self.pubsub.add_subscriber('a', queue.append)
+        # pylint: disable-next=protected-access
+        self.assertEqual(self.pubsub._root.children, {})
+
+    def test_bound_callable(self) -> None:
+        # Callables other than methods that are bound to an object are
+        # kept alive by that object, like bound methods are.
+        calls = []
+
+        class Bound:
+            def __init__(self, obj: object, func: Subscriber) -> None:
+                self.__self__ = obj
+                self.__func__ = func
+
+            def __call__(self, *args: Any, **kwargs: Any) -> None:
+                self.__func__(self.__self__, *args, **kwargs)
+
+        class TestObject:
+            def callback(self, topic: Topic) -> None:
+                calls.append((self, topic))
+
+        obj = TestObject()
+        self.pubsub.add_subscriber('a', Bound(obj, TestObject.callback))
+        self.pubsub.publish('a')
+        self.assertEqual(calls, [(obj, ('a',))])
+
+        calls.clear()
+        del obj
+        gc.collect()
+        self.pubsub.publish('a')
+        self.assertEqual(calls, [])